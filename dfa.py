@@ -30,9 +30,19 @@ class DFA:
                 dot_lines.append(f'\t{state} -> {self.delta[(state,a)]} [label={a}];')
         
         return '\n'.join(dot_lines + ['}'])
-    
+
+    def check_string(self, w: str) -> bool:
+
+        cur_state: int = self.start
+
+        for letter in w:
+            cur_state = self.delta.get((cur_state,letter), -1)
+            if cur_state == -1: return False
+
+        return cur_state in self.finals
+
     @classmethod
-    def from_nfa(cls, nfa: NFA) -> Self:
+    def from_nfa(cls, nfa: NFA, max_states: int | None = None) -> Self:
 
         dfa = DFA()
 
@@ -66,6 +76,8 @@ class DFA:
 
                 if t_tuple not in tuple_to_int:
                     t = max(iter(int_to_tuple.keys()))+1
+                    if max_states is not None and t >= max_states:
+                        raise ValueError(f'DFA needs more than {max_states} states.')
                     int_to_tuple[t] = t_tuple
                     tuple_to_int[t_tuple] = t
                 
@@ -206,12 +206,13 @@ class OrdNFA(NFA):
 def lbd_paths_from(node: int, adj_mat: list[list[list[str]]], lbd: str) -> set[int]:
 
     reachable: set[int] = set()
-    visited: list[int] = []
+    visited: set[int] = set()
     to_visit: list[int] = [node]
 
     while to_visit:
         cur_node = to_visit.pop()
-        visited.append(cur_node)
+        if cur_node in visited: continue
+        visited.add(cur_node)
         if cur_node != node: reachable.add(cur_node)
 
         for next_node in range(len(adj_mat)):
@@ -223,20 +224,25 @@ def lbd_paths_from(node: int, adj_mat: list[list[list[str]]], lbd: str) -> set[i
 def ltr_paths_from(node: int, adj_mat: list[list[list[str]]], lbd: str) -> set[tuple[str, int]]:
 
     to_visit: list[tuple[int,str,int]] = [(0,'',node)]
+    visited: set[tuple[int,str,int]] = {(0,'',node)}
     paths: set[tuple[str,int]] = set()
 
     while to_visit:
-        dst, path_str, t = to_visit.pop(0)
+        dst, path_str, t = to_visit.pop()
 
         if len(path_str) == 1:
             paths.add((path_str,t))
 
         if dst >= 3: continue
 
+        # paths reading more than one letter never count, and revisits add nothing
         for r in range(len(adj_mat)):
             for a in adj_mat[t][r]:
                 if a == lbd: a = ''
-                to_visit.append((dst+1,path_str+a,r))
+                step = (dst+1,path_str+a,r)
+                if len(step[1]) <= 1 and step not in visited:
+                    visited.add(step)
+                    to_visit.append(step)
     
     return paths
 
@@ -247,17 +253,19 @@ def kill_lbd_moves(lbd_nfa: OrdNFA) -> NFA:
     for p in lbd_nfa.states:
         lbd_paths = lbd_paths_from(p, adj_mat, lbd_nfa.blank)
         for q in lbd_paths:
-            adj_mat[p][q].append(lbd_nfa.blank)
+            if lbd_nfa.blank not in adj_mat[p][q]: adj_mat[p][q].append(lbd_nfa.blank)
     
     for p in lbd_nfa.states:
         ltr_paths = ltr_paths_from(p, adj_mat, lbd_nfa.blank)
         for ltr, q in ltr_paths:
-            adj_mat[p][q].append(ltr)
+            if ltr not in adj_mat[p][q]: adj_mat[p][q].append(ltr)
     
     nfa = NFA()
     nfa.set_start(lbd_nfa.start)
     nfa.finals.update(lbd_nfa.finals)
-    if adj_mat[lbd_nfa.start][lbd_nfa.get_final()]: nfa.finals.add(nfa.start)
+    if lbd_nfa.start == lbd_nfa.get_final() or \
+        lbd_nfa.blank in adj_mat[lbd_nfa.start][lbd_nfa.get_final()]:
+        nfa.finals.add(nfa.start)
 
     for p in range(len(adj_mat)):
         for q in range(len(adj_mat)):
@@ -145,9 +145,10 @@ def parse_pda(pdapath: str) -> PDA:
     
     return pda
 
-def get_expr_tree(regex: str, pdapath: str = 'regex.pda') -> RegExTree | None:
+def get_expr_tree(regex: str, pdapath: str = 'regex.pda',
+                  regex_pda: PDA | None = None) -> RegExTree | None:
 
-    regex_pda = parse_pda(pdapath)
+    if regex_pda is None: regex_pda = parse_pda(pdapath)
     if not regex_pda.check_string(regex): return None
 
     op_stack: list[TreeOp] = []
@@ -183,6 +184,8 @@ def get_expr_tree(regex: str, pdapath: str = 'regex.pda') -> RegExTree | None:
                     n_stack.append(RegExTree(left=n1, right=n2, op=last_op))
 
                 op_stack.pop()
+                if type(n_stack[-1]) is str:
+                    n_stack[-1] = RegExTree(left=n_stack[-1], right='', op=TreeOp.CNCT)
             case _:
                 if type(n_stack[-1]) is str:
                     n_stack[-1] = n_stack[-1] + letter
@@ -190,6 +193,11 @@ def get_expr_tree(regex: str, pdapath: str = 'regex.pda') -> RegExTree | None:
                     op_stack.append(TreeOp.CNCT)
                     n_stack.append(letter)
     
+    while op_stack:
+        last_op = op_stack.pop()
+        n2, n1 = n_stack.pop(), n_stack.pop()
+        n_stack.append(RegExTree(left=n1, right=n2, op=last_op))
+
     return n_stack.pop()
 
 def simplify_tree(tree: RegExTree | str | None) -> RegExTree:
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+
+import argparse
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from dfa import *
+
+PDA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regex.pda')
+
+logger = logging.getLogger(__name__)
+
+# patterns follow the grammar in regex.pda: letters a-p and digits, with (), + (union)
+# and * (star); empty groups and repeated stars are rejected. compiling is polynomial in
+# the pattern length and exponential in the worst case, hence both limits
+def compile_regex(regex: str, regex_pda: PDA, max_length: int | None = None,
+                  max_states: int | None = None) -> DFA:
+
+    if max_length is not None and len(regex) > max_length:
+        raise ValueError(f'Regular expression is longer than {max_length} characters.')
+
+    try:
+        tree = get_expr_tree(regex, regex_pda=regex_pda)
+    except KeyError:
+        tree = None
+    if tree is None: raise ValueError(f'Bad regular expression: {regex}')
+
+    ord_nfa = OrdNFA.from_tree(simplify_tree(tree))
+    nfa = kill_lbd_moves(ord_nfa)
+
+    return DFA.minimize(DFA.from_nfa(nfa, max_states=max_states))
+
+async def read_request(reader: asyncio.StreamReader) -> bytes | None:
+
+    # returns None for a line over the reader's limit, after discarding the whole line
+    try:
+        return await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as err:
+        return err.partial
+    except asyncio.LimitOverrunError as err:
+        consumed = err.consumed
+
+    while True:
+        try:
+            await reader.readexactly(consumed)
+            await reader.readuntil(b'\n')
+            return None
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError as err:
+            consumed = err.consumed
+
+def format_reply(reply: asyncio.Future[bool]) -> str:
+
+    if reply.cancelled(): return 'error: request cancelled'
+
+    err = reply.exception()
+    if err is not None: return f'error: {str(err) or type(err).__name__}'
+
+    return '1' if reply.result() else '0'
+
+class MatchService:
+
+    def __init__(self, window: float = 0.005, max_batch: int = 256,
+                 cache_size: int = 1024, max_length: int = 64, max_states: int = 512,
+                 pdapath: str = PDA_PATH) -> None:
+        self.window: float = window
+        self.max_batch: int = max_batch
+        self.cache_size: int = cache_size
+        self.max_length: int = max_length
+        self.max_states: int = max_states
+        self.regex_pda: PDA = parse_pda(pdapath)
+        self.executor: ThreadPoolExecutor | None = None
+
+        # failed compiles stay cached as futures holding their exception
+        self.dfas: OrderedDict[str, asyncio.Future[DFA]] = OrderedDict()
+        self.queue: asyncio.Queue[tuple[str,DFA,str,asyncio.Future[bool]]] = asyncio.Queue()
+        self.batch: list[tuple[str,DFA,str,asyncio.Future[bool]]] = []
+        self.batcher: asyncio.Task | None = None
+
+    def is_running(self) -> bool:
+        return self.batcher is not None and not self.batcher.done()
+
+    async def get_dfa(self, regex: str) -> DFA:
+
+        if regex in self.dfas:
+            self.dfas.move_to_end(regex)
+        else:
+            if self.executor is None: self.executor = ThreadPoolExecutor()
+            self.dfas[regex] = asyncio.get_running_loop().run_in_executor(
+                self.executor, compile_regex, regex, self.regex_pda,
+                self.max_length, self.max_states
+            )
+            if len(self.dfas) > self.cache_size: self.dfas.popitem(last=False)
+
+        return await asyncio.shield(self.dfas[regex])
+
+    def start(self) -> None:
+        if not self.is_running():
+            self.batcher = asyncio.create_task(self.run_batches())
+            self.batcher.add_done_callback(self.batcher_done)
+
+    async def stop(self) -> None:
+
+        # a compile already running finishes in the background instead of holding up shutdown
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+        if self.batcher is None: return
+
+        self.batcher.cancel()
+        try:
+            await self.batcher
+        except asyncio.CancelledError:
+            pass
+        self.batcher = None
+
+    def batcher_done(self, task: asyncio.Task) -> None:
+
+        if task.cancelled():
+            self.fail_pending(None)
+        elif (err := task.exception()) is not None:
+            logger.error('match batcher stopped', exc_info=err)
+            self.fail_pending(err)
+
+    def fail_pending(self, err: BaseException | None) -> None:
+
+        pending, self.batch = self.batch, []
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+
+        for *_, fut in pending:
+            if fut.done(): continue
+            if err is None: fut.cancel()
+            else: fut.set_exception(err)
+
+    async def match(self, regex: str, w: str) -> bool:
+
+        dfa = await self.get_dfa(regex)
+        if not self.is_running(): raise RuntimeError('Match service is not running.')
+
+        fut: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+        await self.queue.put((regex, dfa, w, fut))
+        return await fut
+
+    async def next_batch(self) -> list[tuple[str,DFA,str,asyncio.Future[bool]]]:
+
+        self.batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.window
+
+        while len(self.batch) < self.max_batch:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0: break
+
+            try:
+                self.batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return self.batch
+
+    def match_batch(self, batch: list[tuple[str,DFA,str,asyncio.Future[bool]]]) -> None:
+
+        by_regex: dict[str, tuple[DFA, dict[str, list[asyncio.Future[bool]]]]] = {}
+        for regex, dfa, w, fut in batch:
+            by_regex.setdefault(regex, (dfa, {}))[1].setdefault(w, []).append(fut)
+
+        for dfa, by_string in by_regex.values():
+            for w, futs in by_string.items():
+                try:
+                    accepted = dfa.check_string(w)
+                except Exception as err:
+                    for fut in futs:
+                        if not fut.done(): fut.set_exception(err)
+                    continue
+
+                for fut in futs:
+                    if not fut.done(): fut.set_result(accepted)
+
+    async def run_batches(self) -> None:
+        while True:
+            self.match_batch(await self.next_batch())
+            self.batch = []
+
+    async def write_replies(self, replies: asyncio.Queue[asyncio.Future[bool] | str | None],
+                            writer: asyncio.StreamWriter) -> None:
+
+        broken = False
+        reply: asyncio.Future[bool] | str | None = None
+        try:
+            while (reply := await replies.get()) is not None:
+                if type(reply) is not str:
+                    await asyncio.wait([reply])
+                    reply = format_reply(reply)
+                if broken: continue
+
+                try:
+                    writer.write((reply + '\n').encode('utf8'))
+                    await writer.drain()
+                except ConnectionError:
+                    broken = True
+        finally:
+            if isinstance(reply, asyncio.Future): reply.cancel()
+            while not replies.empty():
+                reply = replies.get_nowait()
+                if isinstance(reply, asyncio.Future): reply.cancel()
+
+    async def handle_client(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+
+        # one request per line: <regex>\t<string>, answered in order with 1, 0 or an
+        # error line; requests are submitted as they are read so they can share a batch
+        replies: asyncio.Queue[asyncio.Future[bool] | str | None] = \
+            asyncio.Queue(maxsize=self.max_batch)
+        reply_task = asyncio.create_task(self.write_replies(replies, writer))
+
+        try:
+            while True:
+                line = await read_request(reader)
+                if line is None:
+                    await replies.put('error: request line is too long')
+                    continue
+                if not line: break
+
+                try:
+                    line = line.decode('utf8').rstrip('\r\n')
+                except UnicodeDecodeError:
+                    await replies.put('error: request is not valid utf8')
+                    continue
+                if line == '': continue
+
+                regex, sep, w = line.partition('\t')
+                if not sep:
+                    await replies.put('error: expected <regex>\\t<string>')
+                else:
+                    await replies.put(asyncio.ensure_future(self.match(regex, w)))
+
+            await replies.put(None)
+            await reply_task
+        except ConnectionError:
+            pass
+        finally:
+            reply_task.cancel()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+async def serve(host: str = '127.0.0.1', port: int = 8765, unix_path: str | None = None,
+                patterns: list[str] | None = None, window: float = 0.005,
+                max_batch: int = 256, cache_size: int = 1024, max_length: int = 64,
+                max_states: int = 512) -> None:
+
+    service = MatchService(window=window, max_batch=max_batch, cache_size=cache_size,
+                           max_length=max_length, max_states=max_states)
+    try:
+        for regex in patterns or []: await service.get_dfa(regex)
+    except BaseException:
+        await service.stop()
+        raise
+    service.start()
+
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(service.handle_client, path=unix_path)
+    else:
+        server = await asyncio.start_server(service.handle_client, host=host, port=port)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+async def request_matches(pairs: list[tuple[str,str]], host: str = '127.0.0.1',
+                          port: int = 8765, unix_path: str | None = None) -> list[bool]:
+
+    for regex, w in pairs:
+        if '\t' in regex or any(c in regex or c in w for c in '\r\n'):
+            raise ValueError(f'Cannot send {regex!r}, {w!r}: no tabs in the regex '
+                             'and no line breaks in either.')
+
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(path=unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host=host, port=port)
+
+    async def send() -> None:
+        writer.writelines(f'{regex}\t{w}\n'.encode('utf8') for regex, w in pairs)
+        await writer.drain()
+
+    async def receive() -> list[bool]:
+
+        results: list[bool] = []
+        for _ in pairs:
+            resp = (await reader.readline()).decode('utf8').rstrip('\n')
+            if not resp: raise ConnectionError('Match server closed the connection.')
+            if resp.startswith('error: '): raise ValueError(resp[len('error: '):])
+            results.append(resp == '1')
+
+        return results
+
+    try:
+        _, results = await asyncio.gather(send(), receive())
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve regex matches over a local socket.')
+    parser.add_argument('patterns', nargs='*', help='regular expressions to compile at startup')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', dest='unix_path', default=None, help='listen on a unix socket instead')
+    parser.add_argument('--window', type=float, default=0.005, help='batching window in seconds')
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--cache-size', type=int, default=1024, help='compiled patterns to keep')
+    parser.add_argument('--max-length', type=int, default=64, help='longest pattern to compile')
+    parser.add_argument('--max-states', type=int, default=512, help='largest DFA to build')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(host=args.host, port=args.port, unix_path=args.unix_path,
+                          patterns=args.patterns, window=args.window,
+                          max_batch=args.max_batch, cache_size=args.cache_size,
+                          max_length=args.max_length, max_states=args.max_states))
+    except ValueError as err:
+        parser.error(str(err))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import asyncio
+import itertools
+import os
+import re
+import tempfile
+import threading
+import time
+
+import pytest
+
+import server
+from server import *
+
+DIV3 = '(0+1(01*0)*1)*'
+
+def all_strings(sigma: str, max_len: int) -> list[str]:
+    return [''.join(p) for n in range(max_len+1) for p in itertools.product(sigma, repeat=n)]
+
+def test_check_string_multiples_of_three():
+
+    dfa = compile_regex(DIV3, parse_pda(PDA_PATH))
+
+    for i in range(256):
+        assert dfa.check_string(bin(i)[2:]) == (i % 3 == 0)
+    assert not dfa.check_string('102')
+
+@pytest.mark.parametrize('regex', [
+    'a', 'ab', 'ab*', 'a*b', '(ab)*', 'a+b', 'ab+ba', '(a+b)*abb', '((a))*b', '(a*b*)*a'
+])
+def test_compile_agrees_with_re(regex):
+
+    dfa = compile_regex(regex, parse_pda(PDA_PATH))
+
+    for w in all_strings('ab', 6):
+        assert dfa.check_string(w) == bool(re.fullmatch(regex.replace('+', '|'), w)), w
+
+def test_concurrent_matches_share_batch(monkeypatch):
+
+    async def run() -> None:
+        service = MatchService(window=0.05)
+        dfa = await service.get_dfa(DIV3)
+
+        batches: list[int] = []
+        match_batch = service.match_batch
+        def record(batch):
+            batches.append(len(batch))
+            match_batch(batch)
+        monkeypatch.setattr(service, 'match_batch', record)
+
+        checked: list[str] = []
+        check_string = dfa.check_string
+        def count(w):
+            checked.append(w)
+            return check_string(w)
+        monkeypatch.setattr(dfa, 'check_string', count)
+        service.start()
+
+        words = ['0', '11', '110', '11', '0', '111']
+        results = await asyncio.gather(*[service.match(DIV3, w) for w in words])
+        await service.stop()
+
+        assert results == [True, True, True, True, True, False]
+        assert batches == [len(words)]
+        assert sorted(checked) == ['0', '11', '110', '111']
+
+    asyncio.run(run())
+
+def test_compiles_once_including_failures(monkeypatch):
+
+    compiled: list[str] = []
+    def count(regex, *args):
+        compiled.append(regex)
+        return compile_regex(regex, *args)
+    monkeypatch.setattr(server, 'compile_regex', count)
+
+    async def run() -> None:
+        service = MatchService(cache_size=2)
+        service.start()
+
+        for _ in range(3):
+            assert await service.match('ab', 'ab')
+            with pytest.raises(ValueError):
+                await service.match('a(', 'a')
+        assert await service.match('ba', 'ba')
+
+        assert list(service.dfas) == ['a(', 'ba']
+        await service.stop()
+
+    asyncio.run(run())
+    assert compiled == ['ab', 'a(', 'ba']
+
+def test_stop_cancels_queued_matches():
+
+    async def run() -> None:
+        service = MatchService(window=10)
+        service.start()
+        await service.get_dfa('ab')
+
+        pending = [asyncio.ensure_future(service.match('ab', 'ab')) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        await service.stop()
+
+        done, _ = await asyncio.wait(pending, timeout=1)
+        assert len(done) == 3 and all(t.cancelled() for t in done)
+        with pytest.raises(RuntimeError):
+            await service.match('ab', 'ab')
+
+    asyncio.run(run())
+
+def test_single_connection_is_batched(monkeypatch):
+
+    async def run() -> None:
+        service = MatchService(window=0.05)
+
+        batches: list[int] = []
+        match_batch = service.match_batch
+        def record(batch):
+            batches.append(len(batch))
+            match_batch(batch)
+        monkeypatch.setattr(service, 'match_batch', record)
+        service.start()
+
+        srv = await asyncio.start_server(service.handle_client, host='127.0.0.1', port=0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            pairs = [(DIV3, bin(i)[2:]) for i in range(100)]
+            results = await request_matches(pairs, port=port)
+        await service.stop()
+
+        assert results == [i % 3 == 0 for i in range(100)]
+        assert sum(batches) == 100 and len(batches) < 10
+
+    asyncio.run(run())
+
+def test_error_replies():
+
+    async def run() -> None:
+        service = MatchService()
+        service.start()
+
+        srv = await asyncio.start_server(service.handle_client, host='127.0.0.1', port=0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            reader, writer = await asyncio.open_connection(host='127.0.0.1', port=port)
+            writer.write(b'a(\ta\nab\n\xff\xfe\ta\nab\tab\n')
+            writer.write_eof()
+            replies = (await reader.read()).decode('utf8').splitlines()
+            writer.close()
+            await writer.wait_closed()
+
+            with pytest.raises(ValueError):
+                await request_matches([('ab', 'ab'), ('a(', 'a')], port=port)
+        await service.stop()
+
+        assert replies[0].startswith('error: Bad regular expression')
+        assert replies[1].startswith('error: expected')
+        assert replies[2] == 'error: request is not valid utf8'
+        assert replies[3] == '1'
+
+    asyncio.run(run())
+
+def test_overlong_line_gets_one_reply():
+
+    async def run() -> None:
+        service = MatchService()
+        service.start()
+
+        srv = await asyncio.start_server(service.handle_client, host='127.0.0.1', port=0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            reader, writer = await asyncio.open_connection(host='127.0.0.1', port=port)
+            writer.write(b'ab\t' + b'a' * 200_000 + b'\nab\tab\n')
+            writer.write_eof()
+            replies = (await reader.read()).decode('utf8').splitlines()
+            writer.close()
+            await writer.wait_closed()
+        await service.stop()
+
+        assert replies == ['error: request line is too long', '1']
+
+    asyncio.run(run())
+
+def test_compile_limits():
+
+    async def run() -> None:
+        service = MatchService(max_length=64, max_states=512)
+        service.start()
+
+        with pytest.raises(ValueError, match='longer than 64'):
+            await service.match('a' * 65, 'a')
+
+        t0 = time.perf_counter()
+        with pytest.raises(ValueError, match='more than 512 states'):
+            await service.match('(a+b)*a' + '(a+b)' * 10, 'a')
+        assert time.perf_counter() - t0 < 5
+
+        assert await service.match('a' * 64, 'a' * 64)
+        await service.stop()
+
+    asyncio.run(run())
+
+def test_stop_does_not_wait_for_compile(monkeypatch):
+
+    release = threading.Event()
+    def slow(regex, *args):
+        release.wait(10)
+        return compile_regex(regex, *args)
+    monkeypatch.setattr(server, 'compile_regex', slow)
+
+    async def run() -> None:
+        service = MatchService()
+        service.start()
+
+        task = asyncio.ensure_future(service.match('ab', 'ab'))
+        await asyncio.sleep(0.05)
+        await service.stop()
+        task.cancel()
+
+    t0 = time.perf_counter()
+    asyncio.run(run())
+    release.set()
+    assert time.perf_counter() - t0 < 2
+
+def test_request_matches_rejects_unsendable_pairs():
+
+    for pair in [('ab', 'a\nb'), ('ab', 'ab\r'), ('a\nb', 'ab'), ('a\tb', 'ab')]:
+        with pytest.raises(ValueError, match='Cannot send'):
+            asyncio.run(request_matches([('ab', 'ab'), pair], port=1))
+
+def test_unix_socket():
+
+    async def run(unix_path: str) -> None:
+        task = asyncio.create_task(serve(unix_path=unix_path, patterns=[DIV3]))
+        while not os.path.exists(unix_path):
+            await asyncio.sleep(0.01)
+
+        results = await asyncio.gather(*[
+            request_matches([(DIV3, '11'), ('ab', 'ab'), ('ab', 'a')], unix_path=unix_path)
+            for _ in range(5)
+        ])
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert results == [[True, True, False]] * 5
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        asyncio.run(run(os.path.join(tmpdir, 'match.sock')))
+
+def test_serve_rejects_bad_startup_pattern():
+    with pytest.raises(ValueError):
+        asyncio.run(serve(port=0, patterns=['a(']))